@@ -7,7 +7,6 @@ setup(
 		'type_test',
 		'type_test/program',
 		'type_test/quotes',
-		'type_test/timer',
 	],
 	package_dir={"type_test": "type_test"},
 	package_data={
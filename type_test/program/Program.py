@@ -1,13 +1,22 @@
 import curses
-import re
-import threading
 from statistics import mean
+from time import monotonic
 
 from type_test.quotes.Quotes import Quotes
-from type_test.timer import Timer
 
 TEXT_POS = (2, 0)
 HEADER_POS = (0, 0)
+# How long getch blocks waiting for a key before giving the main loop a
+# chance to redraw the header (~30 fps)
+TICK_MS = 33
+
+# Key constants referenced on every keypress, bound as module globals -
+# cheaper than an attribute lookup on the curses module each time
+_KEY_BACKSPACE = curses.KEY_BACKSPACE
+_KEY_EXIT = curses.KEY_EXIT
+_KEY_RESIZE = curses.KEY_RESIZE
+_KEY_LEFT = curses.KEY_LEFT
+_KEY_RIGHT = curses.KEY_RIGHT
 
 
 class Colors:
@@ -43,19 +52,49 @@ class Colors:
 class Program:
 	def __init__(self, stdscr) -> None:
 		self.stdscr = stdscr
+		# Block in getch until a key arrives or a redraw is due instead of
+		# spinning - the process sleeps in read() while the user is idle
+		self.stdscr.timeout(TICK_MS)
 		self.colors = Colors()
 		self.quotes = Quotes.load()
 		self.running = False
 		self.started = False
-		self.typed = ""
+		# Typed characters are kept as a list so that a keystroke is an
+		# amortized O(1) append instead of reallocating an ever-growing
+		# string. The full string is only materialized in check_win.
+		self._typed_chars = []
 		self.selected_quote = None
 		# Cursor position
 		self.cur_pos = TEXT_POS
 		self.size = self.stdscr.getmaxyx()
-		self.timer = None
+		# monotonic() timestamp of when the current attempt started. The
+		# getch timeout already wakes the main loop ~30 times a second so
+		# elapsed time is computed inline - no timer thread needed.
+		self._start_time = 0.0
 		self.stats = (0, 0)  # wps, cps
+		# Number of words in the typed buffer, maintained incrementally on
+		# every keystroke so that update_stats never has to re-scan the
+		# whole buffer
+		self._word_count = 0
 		self.time = (0, 0)  # secs, millis
-		self.lock = threading.Lock()
+		# Last time value the header was rendered with - the header is
+		# only re-rendered when the displayed time actually changed
+		self._last_rendered_time = None
+		# Everything the header is rendered from, as of the last time it
+		# was drawn - render_header bails out when none of it changed
+		self._prev_header_state = None
+		# Render cache used for dirty-cell diffing. We remember how many
+		# typed characters are already painted and where the error region
+		# (if any) starts so that render only touches cells that actually
+		# changed since the previous frame.
+		self._prev_typed_len = 0
+		self._error_start = None
+		# Precomputed (y, x) screen position for every cell of the quote
+		self._cell_pos = []
+		# Precomputed ord() of every quote character. Kept as a tuple and
+		# not bytes because quotes may contain characters above Latin-1.
+		self._quote_ords = ()
+		self._needs_full_redraw = True
 		# List of previous attempt wpm's
 		self.previous_attempts = []
 		# Save value of previous attempts average so that we don't have
@@ -64,8 +103,18 @@ class Program:
 
 	def restart(self):
 		self.stdscr.clear()
-		self.typed = ""
+		# The clear wiped the header so the cached state no longer
+		# reflects what is on the screen
+		self._prev_header_state = None
+		self._typed_chars.clear()
+		self._word_count = 0
 		self.selected_quote = self.quotes.random()
+		# The quote is fixed for the whole run so its ord()s only need to
+		# be computed once instead of on every frame
+		self._quote_ords = tuple(map(ord, self.selected_quote.text))
+		self.__compute_cell_positions()
+		# Force the next render to repaint the whole quote
+		self._needs_full_redraw = True
 
 		# we manually call one render so that the user
 		# can see which quote he got
@@ -74,18 +123,17 @@ class Program:
 
 		while not self.started:
 			c = self.stdscr.getch()
-			# TODO: duplicate code
 			if 32 <= c <= 126:
-				self.typed += chr(c)
+				self.__append_typed(chr(c))
 				self.started = True
 			# FIXME: duplicate code:
-			elif c == curses.KEY_RESIZE:
+			elif c == _KEY_RESIZE:
 				self.handle_resize()
-			elif c == curses.KEY_LEFT or c == curses.KEY_RIGHT:
+			elif c == _KEY_LEFT or c == _KEY_RIGHT:
 				self.restart()
 
 		self.running = True
-		self.start_timer()
+		self._start_time = monotonic()
 
 	def run(self):
 		self.restart()
@@ -94,9 +142,15 @@ class Program:
 	# Main loop
 	def loop(self):
 		while self.running:
+			self.update_time()
 			self.render()
+			# Re-render the header only when the displayed time changed
+			if self.time != self._last_rendered_time:
+				self.render_header()
 			self.check_win()
 			self.refresh_screen()
+			# Flush all the staged updates to the terminal in one go
+			self.commit()
 			self.read_input()
 
 	# We call this after rendering the part of the screen which
@@ -105,82 +159,172 @@ class Program:
 		self.stdscr.move(*self.cur_pos)
 
 	def render_header(self):
-		with self.lock:
-			seconds, millis = self.time
-			wpm, cps, avg = self.get_stats()
-			self.stdscr.move(*HEADER_POS)
-			self.stdscr.clrtoeol()
-			# Draw background for the header
-			self.stdscr.chgat(*HEADER_POS, self.size[1], self.colors.HEADER)
-			header_string = "{:.2f} wpm {:.2f} cps {}.{:02d}s {:.2f} avg wpm".format(wpm, cps, seconds, millis, avg)
-			# Draw current data
-			self.stdscr.addstr(*HEADER_POS, header_string, self.colors.HEADER)
-			# Return the cursor to its original position
-			self.update_cursor()
-
-	def render(self):
-		def inc_row_col(y, x):
+		# The header only depends on this state - skip the chgat/format/
+		# addstr work entirely for the frames where none of it changed
+		header_state = (self.time, self.stats, self.size, self.avg_cached)
+		if header_state == self._prev_header_state:
+			return
+		self._prev_header_state = header_state
+		seconds, millis = self.time
+		wpm, cps, avg = self.get_stats()
+		self.stdscr.move(*HEADER_POS)
+		self.stdscr.clrtoeol()
+		# Draw background for the header
+		self.stdscr.chgat(*HEADER_POS, self.size[1], self.colors.HEADER)
+		header_string = "{:.2f} wpm {:.2f} cps {}.{:02d}s {:.2f} avg wpm".format(wpm, cps, seconds, millis, avg)
+		# Draw current data
+		self.stdscr.addstr(*HEADER_POS, header_string, self.colors.HEADER)
+		self._last_rendered_time = (seconds, millis)
+		# Return the cursor to its original position
+		self.update_cursor()
+
+	# Precompute the (y, x) screen position of every cell of the quote
+	# so that render does not have to re-run the wrapping loop on every
+	# frame. One extra trailing entry is kept for the cursor position
+	# after the last character. Must be re-run on resize.
+	def __compute_cell_positions(self):
+		positions = []
+		cur_y, cur_x = TEXT_POS
+		for _ in range(len(self.selected_quote.text) + 1):
+			positions.append((cur_y, cur_x))
 			# This is done to prevent us from running off of the screen.
-			if x == self.size[1] - 1:
-				y += 1
-				x = TEXT_POS[1]  # in case we have some padding
+			if cur_x == self.size[1] - 1:
+				cur_y += 1
+				cur_x = TEXT_POS[1]  # in case we have some padding
 			else:
-				x += 1
-			return y, x
-
-		with self.lock:
-			# Pointers used to track current cursor position to be written on the screen
-			cur_y, cur_x = TEXT_POS
-			# We first manually print the text so that we can find the 'y' position for the title.
-			# Title should be rendered below the text
-			for selected in self.selected_quote.text:
-				self.stdscr.addch(cur_y, cur_x, ord(selected))
-
-				cur_y, cur_x = inc_row_col(cur_y, cur_x)
-
-			errored = False
-			color = self.colors.GREEN
-			# Save 'y' for printing title
-			title_y = cur_y
-			# Reset the position so that we can print the user typed text
-			cur_y, cur_x = TEXT_POS
-
-			for typed, selected in zip(self.typed, self.selected_quote.text):
-				valid = typed == selected
-				if not valid:
-					# We don't reset errored flag unless we re-render the whole text in
-					# next frame. This way we show errors since the first occurrence of
-					# the mistyped letter.
-					errored = True
-				if errored:
-					color = self.colors.ERROR
-				self.stdscr.addch(cur_y, cur_x, ord(selected), color)
-
-				cur_y, cur_x = inc_row_col(cur_y, cur_x)
-
-			title = "{}, {}".format(self.selected_quote.author, self.selected_quote.title)
-			self.stdscr.addstr(TEXT_POS[0] + title_y + 1, TEXT_POS[1], title, self.colors.TITLE)
-
-			# After drawing on the screen we need to set cur_pos to allow
-			# update_cursor to move it to the valid position
-			self.cur_pos = (cur_y, cur_x)
-			self.update_cursor()
+				cur_x += 1
+		self._cell_pos = positions
+
+	def render(self):
+		if self._needs_full_redraw:
+			self.__render_full()
+			self._needs_full_redraw = False
+		else:
+			self.__render_diff()
+
+		# After drawing on the screen we need to set cur_pos to allow
+		# update_cursor to move it to the valid position
+		self.cur_pos = self._cell_pos[min(len(self._typed_chars), len(self.selected_quote.text))]
+		self.update_cursor()
+
+	# Repaint every cell of the quote plus the title. Only needed after
+	# restart or resize; regular frames go through __render_diff instead.
+	def __render_full(self):
+		text = self.selected_quote.text
+		# Hoist the attribute lookups out of the per-run loop
+		addstr = self.stdscr.addstr
+		cell_pos = self._cell_pos
+		# Paint the quote one screen row at a time - one addstr per row
+		# instead of one addch per character
+		i = 0
+		while i < len(text):
+			y, x = cell_pos[i]
+			j = i + 1
+			while j < len(text) and cell_pos[j][0] == y:
+				j += 1
+			addstr(y, x, text[i:j])
+			i = j
+
+		# Recompute from scratch where the error region starts. This way we
+		# show errors since the first occurrence of the mistyped letter.
+		self._error_start = None
+		for i, (typed, selected) in enumerate(zip(self._typed_chars, text)):
+			if typed != selected:
+				self._error_start = i
+				break
+
+		self._prev_typed_len = min(len(self._typed_chars), len(text))
+		self.__paint_cells(0, self._prev_typed_len)
+
+		title = "{}, {}".format(self.selected_quote.author, self.selected_quote.title)
+		self.stdscr.addstr(TEXT_POS[0] + self._cell_pos[len(text)][0] + 1, TEXT_POS[1], title, self.colors.TITLE)
+
+	# Repaint only the cells that changed since the previous frame. Since
+	# read_input changes the typed text by at most one character per frame
+	# this amortizes to O(1) curses calls per keystroke.
+	def __render_diff(self):
+		text = self.selected_quote.text
+		prev_len = self._prev_typed_len
+		cur_len = min(len(self._typed_chars), len(text))
+
+		if cur_len > prev_len:
+			# Characters were appended - the error region can only grow and
+			# only the newly typed cells can start it
+			if self._error_start is None:
+				for i in range(prev_len, cur_len):
+					if self._typed_chars[i] != text[i]:
+						self._error_start = i
+						break
+		elif self._error_start is not None and self._error_start >= cur_len:
+			# Backspaced past the first mistyped letter - everything that is
+			# left matched the quote so the error region is gone
+			self._error_start = None
+
+		# Appended cells get painted with their color, removed cells are
+		# restored to the untyped look
+		self.__paint_cells(min(prev_len, cur_len), cur_len)
+		for i in range(cur_len, prev_len):
+			self.stdscr.addch(*self._cell_pos[i], self._quote_ords[i])
+
+		self._prev_typed_len = cur_len
+
+	# Paint the typed cells in range [start, end) with the appropriate color
+	def __paint_cells(self, start, end):
+		text = self.selected_quote.text
+		# Bind everything the loop touches to locals once - saves several
+		# attribute lookups per character on full repaints
+		addstr = self.stdscr.addstr
+		cell_pos = self._cell_pos
+		ok = self.colors.GREEN
+		err = self.colors.ERROR
+		error_start = self._error_start
+		# Group consecutive cells that share a color and a screen row into
+		# a single addstr call - one C call per run instead of per char
+		i = start
+		while i < end:
+			y, x = cell_pos[i]
+			color = err if error_start is not None and i >= error_start else ok
+			j = i + 1
+			while j < end and cell_pos[j][0] == y and (color is err or error_start is None or j < error_start):
+				j += 1
+			addstr(y, x, text[i:j], color)
+			i = j
 
 	def read_input(self):
 		c = self.stdscr.getch()
-		if c == curses.KEY_BACKSPACE:
-			if len(self.typed) > 0:
-				self.typed = self.typed[:-1]
+		if c == -1:
+			# getch timed out - no key was pressed, nothing to update
+			return
+		if c == _KEY_BACKSPACE:
+			self.__pop_typed()
 		elif c == 4:  # CTRL+D
 			self.restart()
-		elif c == curses.KEY_EXIT:
+		elif c == _KEY_EXIT:
 			self.restart()
 		# FIXME: can this be better?
 		elif 32 <= c <= 126:
-			self.typed += chr(c)
+			self.__append_typed(chr(c))
 
 		self.update_stats()
 
+	# Append a printable character to the typed buffer keeping the word
+	# count in sync. A new word starts whenever a non-space character
+	# follows a space or the beginning of the buffer. Space (32) is the
+	# only whitespace in the printable range read_input accepts.
+	def __append_typed(self, char):
+		if char != ' ' and (len(self._typed_chars) == 0 or self._typed_chars[-1] == ' '):
+			self._word_count += 1
+		self._typed_chars.append(char)
+
+	# Remove the last typed character, reversing the word-count transition
+	# recorded by __append_typed
+	def __pop_typed(self):
+		if len(self._typed_chars) == 0:
+			return
+		if self._typed_chars[-1] != ' ' and (len(self._typed_chars) == 1 or self._typed_chars[-2] == ' '):
+			self._word_count -= 1
+		self._typed_chars.pop()
+
 	# Calculate typing stats. We should call this when we want up-to-date data
 	def get_stats(self):
 		secs = self.time[0]
@@ -194,63 +338,60 @@ class Program:
 	# actual values here because typing occurs way less often than rendering
 	# the header.
 	def update_stats(self):
-		words = len(re.split(r"\s+", self.typed))
-		self.stats = (words, len(self.typed))
+		self.stats = (self._word_count, len(self._typed_chars))
 
 	def check_win(self):
-		if self.selected_quote.text == self.typed:
+		quote = self.selected_quote.text
+		# Compare lengths first so that the join and the full string
+		# compare only happen on the one keystroke that can actually win
+		if len(self._typed_chars) == len(quote) and "".join(self._typed_chars) == quote:
+			# Clearing started freezes the time at the winning value
 			self.started = False
-			self.stop_timer()
 			self.previous_attempts.append(self.get_stats()[0])
 			self.avg_cached = mean(self.previous_attempts)
 			# Re-render header to show new updated average data
 			self.render_header()
-			# Wait for any key then restart
-			self.stdscr.getch()
+			# Wait for any key then restart. getch now times out so keep
+			# retrying until an actual key arrives
+			while self.stdscr.getch() == -1:
+				pass
 			# Don't forget to call restart
 			self.previous_attempts.append(self.get_stats()[0])
 			self.restart()
 
 	def handle_resize(self):
 		self.size = self.stdscr.getmaxyx()
+		# Cell positions depend on the screen width so the wrapping has to
+		# be recomputed and the whole quote repainted
+		self.__compute_cell_positions()
+		self._needs_full_redraw = True
+		self._prev_header_state = None
 		# Re-render after resizing
 		self.stdscr.clear()
 		self.render_header()
 		self.render()
 		self.refresh_screen()
-
-	# Method called by the timer thread used for re-rendering
-	# the header
-	def __timer_callback(self):
-		# We avoid initializing the values to 0
-		# in order to allow showing previous time after
-		# the timer stops
-		seconds, millis = self.time
-		if self.timer is not None:
-			elapsed = self.timer.get_time()
-			seconds = elapsed // 100
-			millis = elapsed - seconds * 100
-		# We save the data
-		self.time = (seconds, millis)
-		self.render_header()
-		self.refresh_screen()
-
-	# Stop the timer by joining its thread
-	def stop_timer(self):
-		if self.timer is not None:
-			self.timer.join()
-
-	def start_timer(self):
-		if self.timer is not None:
-			self.timer.join()
-		self.timer = Timer(callback=self.__timer_callback)
-		self.timer.start()
-
-	# Stop timer and the main loop
+		self.commit()
+
+	# Compute the elapsed time from the main loop's own clock. We leave
+	# self.time alone while no attempt is running so the previous
+	# attempt's time stays visible until the next restart.
+	def update_time(self):
+		if not self.started:
+			return
+		elapsed = int((monotonic() - self._start_time) * 100)
+		self.time = (elapsed // 100, elapsed % 100)
+
+	# Stop the main loop
 	def stop(self):
 		self.running = False
-		self.stop_timer()
 
+	# Stage the window updates without pushing them to the terminal.
+	# curses batches every noutrefresh'd window into the single doupdate
+	# issued by commit which means way fewer characters written to the tty
+	# than a refresh per window per frame.
 	def refresh_screen(self):
-		with self.lock:
-			self.stdscr.refresh()
+		self.stdscr.noutrefresh()
+
+	def commit(self):
+		curses.doupdate()
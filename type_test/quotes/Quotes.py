@@ -27,28 +27,27 @@ class Quotes:
 	def __init__(self, quotes) -> None:
 		super().__init__()
 		self.quotes = {}
-		self.indices = []
-		for quote in map(lambda x: Quotes.__map_to_quote(x), quotes):
-			self.indices.append(quote[0])
-			self.quotes[quote[0]] = quote[1]
-
-	@staticmethod
-	def __map_to_quote(quote_args):
-		quote = Quote(*quote_args)
-		return quote.quote_id, quote
+		for quote_args in quotes:
+			quote = Quote(*quote_args)
+			self.quotes[quote.quote_id] = quote
+		# Flat tuple of all the quotes so that random() is a single
+		# uniform pick instead of an id pick plus a dict lookup. The dict
+		# stays around for lookups by id.
+		self._all = tuple(self.quotes.values())
+		# The debug flag cannot change at runtime so the environment is
+		# only consulted once here instead of on every random() call
+		self._debug_quote = Quote("Author", "Title", "Text", 1) if getenv("TYPE_TEST_DEBUG") is not None else None
 
 	@staticmethod
 	def load():
-		args = {"filename": Quotes.__database_filename, "mode": "rt", "encoding": "utf-8"}
-
-		with gzip.open(**args) as file_obj:
-			quotes = json.load(file_obj)
-			quotes = tuple(map(tuple, quotes))
-			return Quotes(quotes)
+		# Read and decompress the database in one go and decode it with a
+		# single json.loads call. This keeps all the work in C instead of
+		# the incremental text-mode decompression gzip.open does, and the
+		# decoded lists can be unpacked into Quotes directly - no need to
+		# rebuild every entry as a tuple first.
+		with open(Quotes.__database_filename, "rb") as file_obj:
+			quotes = json.loads(gzip.decompress(file_obj.read()))
+		return Quotes(quotes)
 
 	def random(self):
-		if getenv("TYPE_TEST_DEBUG") is not None:
-			return Quote("Author", "Title", "Text", 1)
-		# Should be faster than iterating over the keys of the dict
-		choice = random.choice(self.indices)
-		return self.quotes[choice]
+		return self._debug_quote or random.choice(self._all)
@@ -1 +0,0 @@
-from .Timer import Timer
\ No newline at end of file